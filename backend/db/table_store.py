@@ -0,0 +1,379 @@
+import os
+import re
+import sqlite3
+from contextlib import closing
+import pandas as pd
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+TABLE_DB_PATH = os.getenv("TABLE_DB_PATH", os.path.join(DATA_DIR, "tables.sqlite"))
+
+# Cap on distinct values scanned per text column when looking for a row filter in the question
+MAX_FILTER_VALUES = 1000
+
+# Only unambiguous phrasings: "mean", "the most" or "at least" also occur in ordinary questions
+AGGREGATION_KEYWORDS = {
+    "count": ["how many", "number of", "count of"],
+    "avg": ["average", "mean of", "the mean"],
+    "sum": ["total", "sum of", "the sum"],
+    "max": ["maximum", "highest", "largest"],
+    "min": ["minimum", "lowest", "smallest"],
+}
+
+# Constraints the local queries can't express; questions containing them go to the LLM
+COMPARATIVES = [
+    "above", "below", "over", "under", "at least", "at most", "between", "more than",
+    "less than", "greater than", "fewer than", "exceed", "exceeds", "exceeding",
+    "before", "after", "since", "not", "except", "excluding", "without",
+]
+
+# Words that introduce a row filter, as in "sales for East" or "revenue in 2023"
+FILTER_PREFIXES = ["for", "in", "where", "with", "from"]
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from",
+    "has", "have", "how", "i", "in", "is", "it", "of", "on", "or", "that", "the", "this",
+    "to", "was", "were", "what", "which", "who", "with",
+}
+
+# Question filler that carries no constraint; any other word left unused sends the question to the LLM
+FILLER_WORDS = STOP_WORDS | {
+    "all", "amount", "can", "combined", "data", "give", "me", "much", "overall", "please",
+    "sell", "sells", "sold", "sheet", "show", "table", "tell", "there", "value", "you",
+}
+
+ROW_WORDS = ["rows", "records", "entries"]
+
+
+def _connect():
+    os.makedirs(os.path.dirname(os.path.abspath(TABLE_DB_PATH)), exist_ok=True)
+    return sqlite3.connect(TABLE_DB_PATH)
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _clean_columns(columns):
+    cleaned = []
+    used = set()
+    for i, col in enumerate(columns):
+        base = str(col).strip()
+        if not base or base.lower().startswith("unnamed:"):
+            base = f"column_{i + 1}"
+        name, n = base, 0
+        while name.lower() in used:
+            n += 1
+            name = f"{base}_{n}"
+        used.add(name.lower())
+        cleaned.append(name)
+    return cleaned
+
+
+def _coerce_numeric(df):
+    # Tables parsed from PDFs/HTML often carry numbers as strings like "$1,200"
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        stripped = df[col].astype(str).str.replace(r"[,$%\s]", "", regex=True)
+        converted = pd.to_numeric(stripped, errors="coerce")
+        non_null = df[col].notna() & (df[col].astype(str).str.strip() != "")
+        if non_null.any() and converted[non_null].notna().all():
+            df[col] = converted
+    return df
+
+
+def normalize_table(df):
+    df = df.copy()
+    df.columns = _clean_columns(df.columns)
+    df = df.dropna(how="all")
+    return _coerce_numeric(df)
+
+
+def _table_prefix(document_id):
+    return "t_" + re.sub(r"\W", "_", document_id) + "_"
+
+
+def _drop_tables(conn, pattern):
+    names = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?", (pattern,)
+    ).fetchall()]
+    for name in names:
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+    return len(names)
+
+
+def drop_document_tables(document_id):
+    with closing(_connect()) as conn, conn:
+        return _drop_tables(conn, _table_prefix(document_id) + "*")
+
+
+def clear_tables():
+    # Documents only live in memory, so tables left over from a previous run are unreachable
+    with closing(_connect()) as conn, conn:
+        return _drop_tables(conn, "t_*")
+
+
+def store_table(df, document_id, index, source=""):
+    """
+    Write a DataFrame into the SQLite table store and return its metadata
+    (table name, columns, row count) for the document's processing summary.
+    """
+    table_name = _table_prefix(document_id) + str(index)
+    with closing(_connect()) as conn, conn:
+        df.to_sql(table_name, conn, if_exists="replace", index=False)
+    return {
+        "table": table_name,
+        "source": source,
+        "columns": list(df.columns),
+        "numeric_columns": [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])],
+        "num_rows": len(df),
+    }
+
+
+def _pattern(phrase, plural=False):
+    phrase = str(phrase).lower().replace("_", " ").strip()
+    if not phrase:
+        return None
+    suffix = r"(?:e?s)?" if plural else ""
+    return r"(?<!\w)" + re.escape(phrase) + suffix + r"(?!\w)"
+
+
+def _spans(question, phrase, plural=False):
+    pattern = _pattern(phrase, plural)
+    if pattern is None:
+        return []
+    return [m.span() for m in re.finditer(pattern, question)]
+
+
+def _mentions(question, phrase):
+    return bool(_spans(question, phrase))
+
+
+def _overlaps(a, b):
+    return a[0] < b[1] and b[0] < a[1]
+
+
+def _detect_aggregation(question):
+    for agg, keywords in AGGREGATION_KEYWORDS.items():
+        if any(_mentions(question, kw) for kw in keywords):
+            return agg
+    return None
+
+
+def _column_spans(question, columns):
+    # Longest names first, so "unit price" is not also counted as a mention of "price"
+    found = {}
+    taken = []
+    for col in sorted(columns, key=lambda c: len(str(c)), reverse=True):
+        spans = [s for s in _spans(question, col, plural=True) if not any(_overlaps(s, t) for t in taken)]
+        if spans:
+            found[col] = spans
+            taken.extend(spans)
+    return found
+
+
+def _next_to_column(question, span, col_spans):
+    for cs in col_spans:
+        if cs[1] <= span[0] and re.fullmatch(r"\s*(?:is|=|:|of)?\s*", question[cs[1]:span[0]]):
+            return True
+        if span[1] <= cs[0] and re.fullmatch(r"\s*", question[span[1]:cs[0]]):
+            return True
+    return False
+
+
+def _after_prefix(question, span):
+    prefixes = "|".join(FILTER_PREFIXES)
+    return re.search(r"(?<!\w)(?:" + prefixes + r")\s+(?:the\s+)?$", question[:span[0]]) is not None
+
+
+def _find_filter(conn, table, question, columns, exclude=None, numeric=()):
+    """
+    Find cell values named in the question that can become a WHERE filter.
+    Returns one (column, value, span) per phrase; a phrase that matches several
+    columns equally well yields one entry per column, so callers can treat it as ambiguous.
+    """
+    candidates = []
+    for col in columns:
+        if col == exclude:
+            continue
+        rows = conn.execute(
+            f"SELECT DISTINCT {_quote(col)} FROM {_quote(table)} "
+            f"WHERE {_quote(col)} IS NOT NULL LIMIT {MAX_FILTER_VALUES}"
+        ).fetchall()
+        col_spans = _spans(question, col, plural=True)
+        for (value,) in rows:
+            text = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value).strip()
+            for span in _spans(question, text):
+                adjacent = _next_to_column(question, span, col_spans)
+                prefixed = _after_prefix(question, span)
+                if len(text) < 2 or text.lower() in STOP_WORDS:
+                    # Short and stop-word values ("A", "in") only count right next to their column name
+                    if not adjacent:
+                        continue
+                elif col in numeric or re.fullmatch(r"[\d.,]+", text):
+                    if not (adjacent or prefixed):
+                        continue
+                score = 2 if adjacent else 1 if prefixed else 0
+                candidates.append((col, value, span, score))
+
+    # Keep the longest phrases, then the best-placed column for each phrase
+    candidates.sort(key=lambda c: (c[2][1] - c[2][0], c[3]), reverse=True)
+    filters = []
+    for col, value, span, score in candidates:
+        clash = [f for f in filters if _overlaps(f[2], span)]
+        if not clash:
+            filters.append((col, value, span, score))
+        elif all(f[2] == span and f[3] == score and f[0] != col for f in clash):
+            filters.append((col, value, span, score))
+    return [(col, value, span) for col, value, span, _ in filters]
+
+
+def _format_value(value):
+    # Ints and floats read the same ("1625", "1625.5"); no separators, so years stay "2023"
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def _query_table(conn, meta, question):
+    table = meta["table"]
+    columns = meta["columns"]
+    numeric = meta["numeric_columns"]
+    agg = _detect_aggregation(question)
+    agg_spans = [s for kw in AGGREGATION_KEYWORDS.get(agg, []) for s in _spans(question, kw)]
+    mentioned = _column_spans(question, columns)
+    numeric_mentioned = [c for c in mentioned if c in numeric]
+    source = str(meta.get("source") or "")
+    source_spans = _spans(question, source) if len(source) >= 2 else []
+
+    target = None
+    if agg == "count":
+        for col in numeric_mentioned:
+            # "how many units ..." asks for a quantity, not a row count
+            if any(re.search(r"(?:how many|number of)\s+$", question[:s[0]]) for s in mentioned[col]):
+                agg, target = "sum", col
+    if agg in ("sum", "avg", "max", "min"):
+        if target is None and len(numeric_mentioned) == 1:
+            target = numeric_mentioned[0]
+        if target is not None:
+            filters = _find_filter(conn, table, question, columns, exclude=target, numeric=numeric)
+        else:
+            # Several numeric columns named, e.g. "sales" and "year": the one not used as a filter is aggregated
+            filters = _find_filter(conn, table, question, columns, numeric=numeric)
+            remaining = [c for c in numeric_mentioned if c not in {f[0] for f in filters}]
+            if len(remaining) != 1:
+                return None
+            target = remaining[0]
+    else:
+        filters = _find_filter(conn, table, question, columns, numeric=numeric)
+
+    if len(filters) > 1:
+        return None
+    filt = filters[0] if filters else None
+
+    allowed = set()
+    if filt:
+        allowed.add(filt[0])
+    if agg is None:
+        if not filt or not re.match(r"(what|which)\b", question):
+            return None
+        targets = [c for c in mentioned if c != filt[0]]
+        if len(targets) != 1:
+            return None
+        target = targets[0]
+    elif agg == "count":
+        if not filt and not any(_mentions(question, w) for w in ROW_WORDS):
+            return None
+    elif target is None:
+        return None
+    if target:
+        allowed.add(target)
+    if agg in ("max", "min"):
+        # "which region has the highest sales": the subject column is reported, not filtered
+        allowed.update(c for c, spans in mentioned.items()
+                       if any(re.fullmatch(r"(?:which|what)\s+", question[:s[0]]) for s in spans))
+
+    # Every column, value and number in the question must be used by the query
+    if any(c not in allowed for c in mentioned):
+        return None
+    used = [s for c in allowed if c in mentioned for s in mentioned[c]] + source_spans + agg_spans
+    if filt:
+        used.append(filt[2])
+    leftover = "".join(" " if any(a <= i < b for a, b in used) else ch for i, ch in enumerate(question))
+    if re.search(r"\d", leftover):
+        return None
+    # e.g. "for Europe" when Europe is not a stored value (or lies beyond MAX_FILTER_VALUES)
+    words = [w for w in re.findall(r"[a-z]+", leftover) if len(w) > 1]
+    if any(w not in FILLER_WORDS and w not in ROW_WORDS for w in words):
+        return None
+
+    where, params, scope = "", [], ""
+    if filt:
+        where = f" WHERE {_quote(filt[0])} = ?"
+        params = [filt[1]]
+        scope = f" where {filt[0]} is {_format_value(filt[1])}"
+    if source_spans:
+        scope += f" in {source}"
+    score = len([c for c in allowed if c in mentioned]) + (1 if filt else 0) + (2 if source_spans else 0)
+
+    if agg == "count":
+        sql = f"SELECT COUNT(*) FROM {_quote(table)}{where}"
+        value = conn.execute(sql, params).fetchone()[0]
+        rows = "There is 1 row" if value == 1 else f"There are {value} rows"
+        return {"answer": f"{rows}{scope}.", "sql": sql, "params": params, "score": score}
+    if agg in ("sum", "avg"):
+        sql = f"SELECT {agg.upper()}({_quote(target)}) FROM {_quote(table)}{where}"
+        value = conn.execute(sql, params).fetchone()[0]
+        if value is None:
+            return None
+        label = "total" if agg == "sum" else "average"
+        return {"answer": f"The {label} {target}{scope} is {_format_value(value)}.", "sql": sql, "params": params, "score": score}
+    if agg in ("max", "min"):
+        order = "DESC" if agg == "max" else "ASC"
+        sql = (
+            f"SELECT * FROM {_quote(table)}{where}"
+            f"{' AND' if where else ' WHERE'} {_quote(target)} IS NOT NULL "
+            f"ORDER BY {_quote(target)} {order} LIMIT 1"
+        )
+        row = conn.execute(sql, params).fetchone()
+        if row is None:
+            return None
+        record = ", ".join(f"{c}: {_format_value(v)}" for c, v in zip(columns, row))
+        label = "highest" if agg == "max" else "lowest"
+        value = row[columns.index(target)]
+        return {"answer": f"The {label} {target}{scope} is {_format_value(value)} ({record}).", "sql": sql, "params": params, "score": score}
+    # Lookup: "what is the <column> for <value>"; several matching rows need an aggregation, not a lookup
+    sql = f"SELECT {_quote(target)} FROM {_quote(table)}{where} LIMIT 2"
+    values = [r[0] for r in conn.execute(sql, params).fetchall()]
+    if len(values) != 1:
+        return None
+    return {"answer": f"The {target}{scope} is {_format_value(values[0])}.", "sql": sql, "params": params, "score": score}
+
+
+def answer_table_query(question, tables):
+    """
+    Try to answer an aggregation or lookup question directly from the stored tables.
+    Returns {"answer", "sql", "params", "table", "score"} or None when the question is
+    not fully covered by a local query, or when several tables match it equally well.
+    """
+    question = question.lower().strip()
+    if any(_mentions(question, w) for w in COMPARATIVES):
+        return None
+    results = []
+    with closing(_connect()) as conn, conn:
+        for meta in tables:
+            try:
+                result = _query_table(conn, meta, question)
+            except sqlite3.Error as e:
+                print(f"[TABLE] Query against {meta.get('table')} failed: {e}")
+                continue
+            if result:
+                result["table"] = meta["table"]
+                results.append(result)
+    if not results:
+        return None
+    results.sort(key=lambda r: r["score"], reverse=True)
+    if len(results) > 1 and results[0]["score"] == results[1]["score"]:
+        print("[TABLE] Question matches several tables equally, deferring to the LLM")
+        return None
+    return results[0]
@@ -5,6 +5,7 @@ import uuid
 from backend.processing.document_processor import process_document
 from backend.processing.gemini_client import query_gemini, decompose_query
 from backend.db.chroma_client import add_chunks_to_chroma, query_chroma
+from backend.db.table_store import answer_table_query, clear_tables, drop_document_tables
 from typing import Dict
 import base64
 import json
@@ -19,6 +20,7 @@ DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
 DOCUMENT_STORE: Dict[str, dict] = {}
+clear_tables()
 
 @app.get("/")
 def read_root():
@@ -32,10 +34,15 @@ async def upload_file(file: UploadFile = File(...)):
     with open(file_location, "wb") as f:
         content = await file.read()
         f.write(content)
+    # Re-uploading a file overwrites it on disk, so the tables extracted from the old copy are stale
+    for old_id, old_doc in DOCUMENT_STORE.items():
+        if old_doc["file_path"] == file_location and old_doc["processing"].get("tables"):
+            drop_document_tables(old_id)
+            old_doc["processing"]["tables"] = []
     print("[UPLOAD] File saved, starting document processing...")
-    processing_summary = process_document(file_location)
-    print("[UPLOAD] Document processing complete")
     doc_id = str(uuid.uuid4())
+    processing_summary = process_document(file_location, document_id=doc_id)
+    print("[UPLOAD] Document processing complete")
     DOCUMENT_STORE[doc_id] = {
         "filename": file.filename,
         "file_path": file_location,
@@ -82,6 +89,14 @@ async def query_document(document_id: str, question: str):
         print("[QUERY] Gemini response received.")
         answer = gemini_response.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "No answer from Gemini.")
         return {"answer": answer}
+    # Aggregation/lookup questions over extracted tables are answered locally, skipping Gemini
+    tables = processing.get("tables", [])
+    if tables:
+        print("[QUERY] Trying table store query...")
+        table_result = answer_table_query(question, tables)
+        if table_result:
+            print(f"[QUERY] Answered from table store: {table_result['sql']}")
+            return {"answer": table_result["answer"], "source": "table", "sql": table_result["sql"]}
     # For text documents, log and handle each step
     try:
         print("[QUERY] Performing ChromaDB vector search...")
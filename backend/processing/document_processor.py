@@ -5,6 +5,8 @@ from PIL import Image
 import base64
 import io
 import re
+import pandas as pd
+from backend.db.table_store import normalize_table, store_table
 
 # Optional imports for new formats
 try:
@@ -22,6 +24,9 @@ SUPPORTED_FORMATS = [
 
 CHART_KEYWORDS = ["chart", "graph", "plot", "figure", "diagram"]
 
+# Rows per embedded table chunk, so one large table doesn't become one giant chunk
+TABLE_CHUNK_ROWS = 50
+
 def is_chart_image(el) -> bool:
     caption = getattr(el, 'caption', '') or ''
     alt_text = getattr(el, 'alt_text', '') or ''
@@ -52,7 +57,54 @@ def extract_sections(text: str, ext: str):
                 sections.append({"level": 1, "title": line.strip()})
     return sections
 
-def process_document(file_path: str) -> Dict[str, Any]:
+def chunk_table(df, source: str = ""):
+    # Each chunk repeats the header row so it can be understood on its own
+    chunks = []
+    label = f"Table {source}".strip()
+    for start in range(0, len(df), TABLE_CHUNK_ROWS):
+        part = df.iloc[start:start + TABLE_CHUNK_ROWS]
+        end = start + len(part)
+        text = f"{label} (rows {start + 1}-{end})\n{part.to_csv(index=False)}"
+        chunks.append({"text": text, "type": "table"})
+    return chunks
+
+def table_from_element(el):
+    # unstructured exposes detected table structure as HTML on the element metadata
+    html = getattr(getattr(el, 'metadata', None), 'text_as_html', None)
+    if not html:
+        return None
+    try:
+        frames = pd.read_html(io.StringIO(html))
+    except Exception:
+        return None
+    if not frames:
+        return None
+    df = frames[0]
+    if isinstance(df.columns, pd.MultiIndex):
+        # Multi-row headers: join the distinct levels into one column name
+        df.columns = [
+            " ".join(dict.fromkeys(str(p) for p in col if not str(p).startswith("Unnamed:")))
+            for col in df.columns
+        ]
+    elif list(df.columns) == list(range(len(df.columns))) and len(df) > 0:
+        # No <th> row: the header text is in the first data row
+        df.columns = [str(v) if pd.notna(v) else "" for v in df.iloc[0]]
+        df = df.iloc[1:].reset_index(drop=True)
+    return df
+
+def index_table(df, source: str, document_id: str, tables_meta: list):
+    df = normalize_table(df)
+    if df.empty or len(df.columns) == 0:
+        # Empty sheets and tables have nothing to store or embed
+        return []
+    if document_id:
+        try:
+            tables_meta.append(store_table(df, document_id, len(tables_meta), source))
+        except Exception as e:
+            print(f"[PROCESS] Failed to store table {source}: {e}")
+    return chunk_table(df, source)
+
+def process_document(file_path: str, document_id: str = None) -> Dict[str, Any]:
     ext = os.path.splitext(file_path)[1].lower()
     if ext not in SUPPORTED_FORMATS:
         return {"error": f"Unsupported file type: {ext}"}
@@ -137,6 +189,38 @@ def process_document(file_path: str) -> Dict[str, Any]:
             "status": "processed"
         }
 
+    elif ext in [".csv", ".xlsx"]:
+        # Spreadsheets: read with pandas so column types survive into the table store
+        try:
+            if ext == ".csv":
+                frames = {"": pd.read_csv(file_path)}
+            else:
+                frames = pd.read_excel(file_path, sheet_name=None)
+        except Exception as e:
+            return {"error": f"Failed to parse document: {str(e)}"}
+        text_chunks = []
+        tables_meta = []
+        num_tables = 0
+        for sheet, df in frames.items():
+            sheet_chunks = index_table(df, str(sheet), document_id, tables_meta)
+            if sheet_chunks:
+                num_tables += 1
+            text_chunks.extend(sheet_chunks)
+        return {
+            "num_chunks": len(text_chunks),
+            "num_images": 0,
+            "num_charts": 0,
+            "num_tables": num_tables,
+            "num_code_blocks": 0,
+            "chunks": text_chunks,
+            "text_preview": [c["text"] for c in text_chunks[:2]],
+            "image_paths": [],
+            "charts": [],
+            "sections": [],
+            "tables": tables_meta,
+            "status": "processed"
+        }
+
     # Use unstructured to partition the document for other formats
     try:
         elements = partition(filename=file_path)
@@ -148,6 +232,7 @@ def process_document(file_path: str) -> Dict[str, Any]:
     image_paths = []
     charts = []
     tables = []
+    tables_meta = []
     code_blocks = []
     data_dir = os.path.join(os.path.dirname(file_path))
     for idx, el in enumerate(elements):
@@ -159,6 +244,10 @@ def process_document(file_path: str) -> Dict[str, Any]:
             elif el.category == "Table":
                 chunk_type = "table"
                 tables.append(el)
+                df = table_from_element(el)
+                if df is not None:
+                    text_chunks.extend(index_table(df, str(len(tables)), document_id, tables_meta))
+                    continue
             text_chunks.append({"text": el.text, "type": chunk_type})
         if el.category == "Image":
             if hasattr(el, 'image') and el.image is not None:
@@ -184,5 +273,6 @@ def process_document(file_path: str) -> Dict[str, Any]:
         "image_paths": image_paths,
         "charts": charts,
         "sections": sections,
+        "tables": tables_meta,
         "status": "processed"
-    } 
\ No newline at end of file
+    }
@@ -0,0 +1,138 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from backend.db import table_store
+from backend.db.table_store import (
+    _clean_columns,
+    _detect_aggregation,
+    _find_filter,
+    answer_table_query,
+    normalize_table,
+    store_table,
+)
+
+SALES = pd.DataFrame({
+    "Region": ["East", "West", "East", "North"],
+    "Grade": ["A", "B", "A", "C"],
+    "Year": [2022, 2023, 2023, 2022],
+    "Sales": ["$1,200", "$800", "$3,000", "$1,500"],
+    "Units": [3, 4, 5, 6],
+})
+
+
+@pytest.fixture(autouse=True)
+def table_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(table_store, "TABLE_DB_PATH", str(tmp_path / "tables.sqlite"))
+
+
+@pytest.fixture
+def sales_table():
+    return [store_table(normalize_table(SALES), "doc-1", 0)]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    normalize_table(SALES).to_sql("sales", conn, index=False)
+    yield conn
+    conn.close()
+
+
+def _filters(conn, question, exclude=None):
+    return [(col, value) for col, value, _ in _find_filter(
+        conn, "sales", question, ["Region", "Grade", "Year"], exclude=exclude, numeric=["Year"]
+    )]
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("what is the total sales?", "sum"),
+    ("what is the average of units?", "avg"),
+    ("how many rows are there?", "count"),
+    ("which region has the highest sales?", "max"),
+    ("which region has the lowest units?", "min"),
+    ("which region sold the least units?", None),
+    ("what does sales mean?", None),
+    ("which regions sold at least 10 units?", None),
+    ("what are the most important points?", None),
+])
+def test_detect_aggregation(question, expected):
+    assert _detect_aggregation(question) == expected
+
+
+def test_find_filter_matches_value(conn):
+    assert _filters(conn, "what is the total sales for east?") == [("Region", "East")]
+
+
+def test_find_filter_ignores_stop_word_values(conn):
+    assert _filters(conn, "what is the average sales of a region?") == []
+
+
+def test_find_filter_accepts_short_value_next_to_column(conn):
+    assert _filters(conn, "how many rows have grade a?") == [("Grade", "A")]
+
+
+def test_find_filter_numbers_need_prefix_or_column(conn):
+    assert _filters(conn, "total sales in 2023") == [("Year", 2023)]
+    assert _filters(conn, "2023 total sales") == []
+
+
+def test_find_filter_keeps_excluded_column_out(conn):
+    assert _filters(conn, "how many rows have region east?", exclude="Region") == []
+
+
+def test_clean_columns_suffixes_are_unique():
+    assert _clean_columns(["a", "a_1", "a", "", "Unnamed: 4"]) == ["a", "a_1", "a_2", "column_4", "column_5"]
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("What is the total sales for East?", "The total Sales where Region is East is 4200."),
+    ("What is the total sales in 2023?", "The total Sales where Year is 2023 is 3800."),
+    ("How many units did West sell?", "The total Units where Region is West is 4."),
+    ("How many rows have Region East?", "There are 2 rows where Region is East."),
+    ("How many rows have Region North?", "There is 1 row where Region is North."),
+    ("What is the average sales for East?", "The average Sales where Region is East is 2100."),
+    ("What is the average sales?", "The average Sales is 1625."),
+    ("What is the average units for East?", "The average Units where Region is East is 4."),
+    ("What is the average units?", "The average Units is 4.5."),
+    ("What is the sales for West?", "The Sales where Region is West is 800."),
+    ("Which region has the highest sales?",
+     "The highest Sales is 3000 (Region: East, Grade: A, Year: 2023, Sales: 3000, Units: 5)."),
+])
+def test_answer_table_query(sales_table, question, answer):
+    assert answer_table_query(question, sales_table)["answer"] == answer
+
+
+@pytest.mark.parametrize("question", [
+    "How many products have sales above 1000?",
+    "Which regions sold at least 10 units?",
+    "What does Sales mean?",
+    "What is the average sales of a region?",
+    "What is the total sales for East and West?",
+    "What is the total sales for 5 regions?",
+    "What is the total sales for Europe?",
+    "What is the average sales for the Acme account?",
+    "What was the largest sales in March?",
+    "What is the sales for East?",
+    "Summarize the document",
+])
+def test_answer_table_query_defers_to_llm(sales_table, question):
+    assert answer_table_query(question, sales_table) is None
+
+
+def test_answer_table_query_defers_when_value_is_beyond_scan_cap(sales_table, monkeypatch):
+    monkeypatch.setattr(table_store, "MAX_FILTER_VALUES", 2)
+    assert answer_table_query("What is the total sales for North?", sales_table) is None
+
+
+def test_answer_table_query_picks_sheet_by_name():
+    revenue = {"2022": [1, 2], "2023": [100, 200]}
+    tables = [
+        store_table(normalize_table(pd.DataFrame({"Region": ["East", "West"], "Revenue": rows})), "doc-2", i, sheet)
+        for i, (sheet, rows) in enumerate(revenue.items())
+    ]
+    result = answer_table_query("What is the total revenue in 2023?", tables)
+    assert result["table"] == tables[1]["table"]
+    assert result["answer"] == "The total Revenue in 2023 is 300."
+    assert answer_table_query("What is the total revenue?", tables) is None